@@ -1,16 +1,32 @@
 import os
+import json
 import time
-import glob
+import atexit
+import shutil
 import logging
+import zipfile
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
 import yaml
 import pandas as pd
 import requests
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, ElementClickInterceptedException
+from requests.adapters import HTTPAdapter
+
+
+NSE_BASE = "https://www.nseindia.com"
+
+# Zip archives larger than this spill to a temp file instead of staying in RAM
+ZIP_SPILL_THRESHOLD = 64 << 20
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                  "AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/125.0.0.0 Safari/537.36",
+    "Accept": "application/json, text/plain, */*",
+    "Accept-Language": "en-US,en;q=0.9",
+}
 
 
 # ----------------- Logging Setup -----------------
@@ -25,127 +41,202 @@ def setup_logging(log_file):
     )
 
 
-# ----------------- Driver Factory -----------------
-def create_driver(download_dir: str) -> webdriver.Chrome:
-    options = Options()
-    # Run in headless mode (no browser window)
-    options.add_argument("--headless=new")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-blink-features=AutomationControlled")
-    options.add_experimental_option("excludeSwitches", ["enable-logging"])
-    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                         "AppleWebKit/537.36 (KHTML, like Gecko) "
-                         "Chrome/125.0.0.0 Safari/537.36")
-
-    prefs = {
-        "download.default_directory": os.path.abspath(download_dir),
-        "download.prompt_for_download": False,
-        "download.directory_upgrade": True,
-        "plugins.always_open_pdf_externally": True
-    }
-    options.add_experimental_option("prefs", prefs)
-
-    return webdriver.Chrome(options=options)
-
-
-# ----------------- Download Wait Helper -----------------
-def wait_for_downloads(download_dir, timeout=120):
-    """
-    Wait until all downloads in download_dir are complete (no .crdownload files).
+# ----------------- Session Factory -----------------
+_session = None
+
+
+def get_session(pool_size: int = 16) -> requests.Session:
+    """Return the per-process Session, creating it on first use.
+
+    One session per worker process keeps TCP/TLS connections and NSE cookies
+    warm across tickers instead of paying the setup cost for each one. The
+    pool holds at least pool_size connections so every download thread can
+    keep a persistent connection instead of opening and discarding sockets.
     """
-    logging.info("Waiting for downloads to complete...")
-    end_time = time.time() + timeout
-    while time.time() < end_time:
-        files = glob.glob(os.path.join(download_dir, "*"))
-        if files and all(not f.endswith(".crdownload") for f in files):
-            return True
-        time.sleep(1)
-    return False
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.headers.update(HEADERS)
+        pool_size = max(pool_size, 16)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        _session.mount("https://", adapter)
+        _session.mount("http://", adapter)
+        atexit.register(_session.close)
+    return _session
 
 
 # ----------------- Downloader Class -----------------
 class AnnualReportDownloader:
-    def __init__(self, symbol: str, base_download_dir: str):
+    def __init__(self, symbol: str, base_download_dir: str, max_downloads: int = 8,
+                 manifest_max_age_days: int = 7):
         self.symbol = symbol
         self.download_dir = os.path.join(os.path.abspath(base_download_dir), f"{symbol}_D")
         os.makedirs(self.download_dir, exist_ok=True)
-        self.driver = create_driver(self.download_dir)
-        self.wait = WebDriverWait(self.driver, 20)
+        self.max_downloads = max_downloads
+        self.manifest_path = os.path.join(self.download_dir, "manifest.json")
+        self.manifest_max_age = manifest_max_age_days * 86400
+        self.session = get_session(pool_size=max_downloads)
 
-    def open_company_page(self):
-        url = f"https://www.nseindia.com/get-quotes/equity?symbol={self.symbol}"
-        logging.info(f"Opening {url}")
-        self.driver.get(url)
+    def _load_manifest(self):
+        """Return the cached report list if the manifest is still fresh."""
+        try:
+            if time.time() - os.path.getmtime(self.manifest_path) > self.manifest_max_age:
+                return None
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
 
-    def open_annual_reports_tab(self):
+    def _save_manifest(self, reports):
         try:
-            annual_tab = self.wait.until(
-                EC.presence_of_element_located((By.XPATH, "//a[contains(text(),'Annual Reports')]"))
-            )
-            self.driver.execute_script("arguments[0].scrollIntoView(true);", annual_tab)
-            time.sleep(1)
-            try:
-                annual_tab.click()
-            except ElementClickInterceptedException:
-                logging.warning("Normal click failed, retrying with JS click...")
-                self.driver.execute_script("arguments[0].click();", annual_tab)
-
-            logging.info("Clicked on Annual Reports tab")
-        except TimeoutException:
-            logging.error("Annual Reports tab not found!")
+            with open(self.manifest_path, "w") as f:
+                json.dump(reports, f, indent=2)
+        except OSError as e:
+            logging.warning(f"Could not write manifest for {self.symbol}: {e}")
+
+    def fetch_report_list(self):
+        """Hit NSE's annual-reports JSON API and return the list of reports."""
+        cached = self._load_manifest()
+        if cached is not None:
+            logging.info(f"Using cached report list for {self.symbol}")
+            return cached
+
+        if "nsit" not in self.session.cookies:
+            quote_url = f"{NSE_BASE}/get-quotes/equity?symbol={self.symbol}"
+            logging.info(f"Seeding session cookies from {quote_url}")
+            self.session.get(quote_url, timeout=30)  # sets nsit/nseappid cookies
+
+        api_url = f"{NSE_BASE}/api/annual-reports?index=equities&symbol={self.symbol}"
+        logging.info(f"Fetching report list from {api_url}")
+        r = self.session.get(api_url, timeout=30)
+        r.raise_for_status()
+        reports = r.json().get("data", [])
+        if reports:
+            self._save_manifest(reports)
+        return reports
+
+    def _already_downloaded(self, href, file_path):
+        """Check whether file_path already holds the complete remote file."""
+        if not os.path.exists(file_path):
             return False
-        return True
+        try:
+            head = self.session.head(href, timeout=30, allow_redirects=True)
+            remote_size = int(head.headers.get("Content-Length", -1))
+        except Exception:
+            return False  # can't verify, re-download to be safe
+        return remote_size == os.path.getsize(file_path)
 
-    def download_reports(self):
-        time.sleep(5)  # wait for page to load
-        report_links = self.driver.find_elements(By.XPATH, "//a[contains(@href, '.pdf') or contains(@href, '.zip')]")
+    def _zip_done_path(self, file_name):
+        return os.path.join(self.download_dir, file_name + ".done")
 
-        if not report_links:
-            logging.error(f"No report links found for {self.symbol}")
-            return
+    def _zip_already_extracted(self, file_name):
+        """Check whether every member recorded for this archive is on disk."""
+        try:
+            with open(self._zip_done_path(file_name), "r") as f:
+                members = [line.strip() for line in f if line.strip()]
+        except OSError:
+            return False
+        return bool(members) and all(
+            os.path.exists(os.path.join(self.download_dir, m)) for m in members)
+
+    def _extract_zip_inline(self, r, file_name):
+        """Unzip a report archive straight from the response, no zip on disk."""
+        extracted = []
+        # Spooled buffer rolls over to a temp file past the threshold, so
+        # concurrent zip downloads can't pile whole archives up in memory
+        with tempfile.SpooledTemporaryFile(max_size=ZIP_SPILL_THRESHOLD) as buf:
+            shutil.copyfileobj(r.raw, buf, length=1 << 20)
+            with zipfile.ZipFile(buf) as zf:
+                for member in zf.namelist():
+                    member_name = os.path.basename(member)
+                    if not member_name:  # directory entry
+                        continue
+                    target_path = os.path.join(self.download_dir, member_name)
+                    with zf.open(member) as source, \
+                            open(target_path + ".part", "wb") as target:
+                        shutil.copyfileobj(source, target, length=1 << 20)
+                    os.replace(target_path + ".part", target_path)
+                    logging.info(f"Extracted {member_name} from {file_name}")
+                    extracted.append(member_name)
+        # Record the members so reruns can skip re-downloading the archive
+        if extracted:
+            with open(self._zip_done_path(file_name), "w") as f:
+                f.write("\n".join(extracted) + "\n")
 
-        for idx, link in enumerate(report_links, start=1):
-            href = link.get_attribute("href")
-            link_text = link.text.strip() or f"Report_{idx}"
-
-            logging.info(f"Triggering download for: {link_text}")
-            try:
-                # If href is a direct PDF/ZIP link -> use requests
-                if href and href.lower().endswith((".pdf", ".zip")):
-                    file_name = os.path.basename(href.split("?")[0])  # keep original filename
-                    file_path = os.path.join(self.download_dir, file_name)
-
-                    r = requests.get(href, stream=True, headers={"User-Agent": "Mozilla/5.0"})
-                    with open(file_path, "wb") as f:
-                        for chunk in r.iter_content(1024):
-                            f.write(chunk)
-                    logging.info(f"Downloaded directly: {file_name}")
+    def _download_one(self, href, file_path):
+        """Fetch a single report file; one failure must not sink the batch."""
+        file_name = os.path.basename(file_path)
+        is_zip = file_name.lower().endswith(".zip")
+        if is_zip:
+            if self._zip_already_extracted(file_name):
+                logging.info(f"Already extracted, skipping: {file_name}")
+                return
+        elif self._already_downloaded(href, file_path):
+            logging.info(f"Already downloaded, skipping: {file_name}")
+            return
+        logging.info(f"Downloading: {file_name}")
+        try:
+            with self.session.get(href, stream=True, timeout=60) as r:
+                r.raise_for_status()
+                r.raw.decode_content = True
+                if is_zip:
+                    self._extract_zip_inline(r, file_name)
                 else:
-                    # Otherwise click via Selenium
-                    self.driver.execute_script("arguments[0].click();", link)
-                    if wait_for_downloads(self.download_dir, timeout=120):
-                        files = glob.glob(os.path.join(self.download_dir, "*"))
-                        for f in files:
-                            logging.info(f"Downloaded via browser: {os.path.basename(f)}")
-                    else:
-                        logging.warning(f"Download timeout: {link_text}")
-            except Exception as e:
-                logging.error(f"Failed to download {link_text}: {e}")
+                    # One reusable 1 MiB buffer; readinto avoids a fresh bytes
+                    # allocation per chunk, and the file is opened unbuffered.
+                    # Write under a .part name and rename once complete so
+                    # watchers never see a final-named file mid-write.
+                    buf = memoryview(bytearray(1 << 20))
+                    with open(file_path + ".part", "wb", buffering=0) as f:
+                        while True:
+                            n = r.raw.readinto(buf)
+                            if not n:
+                                break
+                            f.write(buf[:n])
+                    os.replace(file_path + ".part", file_path)
+            logging.info(f"Downloaded: {file_name}")
+        except Exception as e:
+            logging.error(f"Failed to download {file_name}: {e}")
+
+    def download_reports(self, reports):
+        tasks = []
+        for idx, report in enumerate(reports, start=1):
+            href = report.get("fileName")
+            if not href:
+                logging.warning(f"Report entry {idx} for {self.symbol} has no file URL, skipping")
+                continue
+
+            file_name = os.path.basename(href.split("?")[0]) or f"Report_{idx}"
+            tasks.append((href, os.path.join(self.download_dir, file_name)))
+
+        # Files are independent and I/O-bound, so fetch them concurrently
+        with ThreadPoolExecutor(max_workers=self.max_downloads) as executor:
+            list(executor.map(lambda t: self._download_one(*t), tasks))
 
         logging.info(f"Reports downloaded to {self.download_dir}")
 
     def run(self):
         try:
-            self.open_company_page()
-            if self.open_annual_reports_tab():
-                self.download_reports()
+            reports = self.fetch_report_list()
+            if not reports:
+                logging.error(f"No report links found for {self.symbol}")
+                return
+            self.download_reports(reports)
         finally:
-            self.driver.quit()
             logging.info(f"All reports processed for {self.symbol} [OK]")
 
 
 # ----------------- Runner -----------------
+def _run_one(ticker, download_path, max_downloads, manifest_max_age_days):
+    logging.info(f"Processing ticker: {ticker}")
+    try:
+        downloader = AnnualReportDownloader(ticker, download_path, max_downloads,
+                                            manifest_max_age_days)
+        downloader.run()
+    except Exception as e:
+        logging.error(f"Error while processing {ticker}: {e}")
+
+
 if __name__ == "__main__":
 
     with open("downloader/config/downloader.yaml", "r") as f:
@@ -154,6 +245,9 @@ if __name__ == "__main__":
     csv_file = config["path"]["csv"]
     download_path = config["path"]["downloads"]
     log_path = config["path"]["logs"]
+    max_workers = config["concurrency"]["max_workers"]
+    max_downloads = config["concurrency"]["max_downloads"]
+    manifest_max_age_days = config["cache"]["manifest_max_age_days"]
 
     # Ensure log directory exists
     log_dir = os.path.dirname(log_path)
@@ -161,14 +255,13 @@ if __name__ == "__main__":
 
     setup_logging(log_path)
 
-    tickers = pd.read_csv(csv_file)["ticker"].dropna().unique().tolist()
+    tickers = pd.read_csv(csv_file, usecols=["ticker"])["ticker"].dropna().unique().tolist()
 
     logging.info(f"Found {len(tickers)} tickers in {csv_file}")
 
-    for ticker in tickers:
-        logging.info(f"Processing ticker: {ticker}")
-        try:
-            downloader = AnnualReportDownloader(ticker, download_path)
-            downloader.run()
-        except Exception as e:
-            logging.error(f"Error while processing {ticker}: {e}")
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             initializer=setup_logging,
+                             initargs=(log_path,)) as executor:
+        list(executor.map(partial(_run_one, download_path=download_path,
+                                  max_downloads=max_downloads,
+                                  manifest_max_age_days=manifest_max_age_days), tickers))
@@ -3,6 +3,8 @@ import time
 import logging
 import shutil
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
 import yaml
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
@@ -35,7 +37,7 @@ def process_file(src_path, unzipped_dir):
                     target_path = os.path.join(unzipped_dir, os.path.basename(namelist[0]))
                     os.makedirs(os.path.dirname(target_path), exist_ok=True)
                     with zf.open(namelist[0]) as source, open(target_path, "wb") as target:
-                        shutil.copyfileobj(source, target)
+                        shutil.copyfileobj(source, target, length=1 << 20)
                     logging.info(f"Extracted single file {namelist[0]} -> {target_path}")
 
                 else:  # multiple files
@@ -43,9 +45,26 @@ def process_file(src_path, unzipped_dir):
                     target_dir = os.path.join(unzipped_dir, zip_name)
                     os.makedirs(target_dir, exist_ok=True)
 
-                    # overwrite existing files
-                    for member in zf.namelist():
-                        zf.extract(member, target_dir)
+                    # pre-create member directories so parallel extracts
+                    # don't race each other in makedirs
+                    for member in namelist:
+                        member_dir = os.path.dirname(member)
+                        if member_dir:
+                            os.makedirs(os.path.join(target_dir, member_dir),
+                                        exist_ok=True)
+
+                    # each worker opens its own handle; reads on a shared
+                    # ZipFile serialize on its internal lock
+                    def extract_members(members):
+                        with zipfile.ZipFile(src_path, "r") as worker_zf:
+                            for member in members:
+                                worker_zf.extract(member, target_dir)
+
+                    # extract members concurrently, overwriting existing files
+                    workers = 4
+                    with ThreadPoolExecutor(max_workers=workers) as extractors:
+                        list(extractors.map(extract_members,
+                                            [namelist[i::workers] for i in range(workers)]))
                     logging.info(f"Extracted multiple files from {src_path} -> {target_dir}")
 
         else:  # non-zip, copy as-is (overwrite if exists)
@@ -60,13 +79,26 @@ def process_file(src_path, unzipped_dir):
         logging.error(f"Failed to process {src_path}: {e}")
 
 # ----------------- Event Handlers -----------------
+PARTIAL_EXTENSIONS = (".crdownload", ".part", ".tmp")
+
+
 class DownloadsHandler(FileSystemEventHandler):
     """Handles new or updated files in ticker downloads/ folder"""
-    def __init__(self, unzipped_dir):
+    def __init__(self, unzipped_dir, executor):
         self.unzipped_dir = unzipped_dir
+        self.executor = executor
 
     def _wait_for_file(self, filepath, timeout=30, interval=1):
         """Wait until file is stable (size not changing)."""
+        # A non-empty file with a final extension is already complete; only
+        # in-progress downloads carry a partial suffix
+        if not filepath.lower().endswith(PARTIAL_EXTENSIONS):
+            try:
+                if os.path.getsize(filepath) > 0:
+                    return True
+            except FileNotFoundError:
+                pass
+
         start_time = time.time()
         last_size = -1
 
@@ -81,36 +113,49 @@ class DownloadsHandler(FileSystemEventHandler):
             time.sleep(interval)
         return False
 
+    def _handle(self, filepath):
+        if self._wait_for_file(filepath):
+            process_file(filepath, self.unzipped_dir)
+        else:
+            logging.warning(f"File {filepath} not stable after timeout, skipping.")
+
     def on_created(self, event):
         if not event.is_directory:
+            if event.src_path.lower().endswith(PARTIAL_EXTENSIONS):
+                return  # in-flight download; the rename to the final name follows
             logging.info(f"New file detected: {event.src_path}")
-            if self._wait_for_file(event.src_path):
-                process_file(event.src_path, self.unzipped_dir)
-            else:
-                logging.warning(f"File {event.src_path} not stable after timeout, skipping.")
+            self.executor.submit(self._handle, event.src_path)
 
     def on_modified(self, event):
         if not event.is_directory:
+            if event.src_path.lower().endswith(PARTIAL_EXTENSIONS):
+                return
             logging.info(f"File updated: {event.src_path}")
-            if self._wait_for_file(event.src_path):
-                process_file(event.src_path, self.unzipped_dir)
-            else:
-                logging.warning(f"File {event.src_path} not stable after timeout, skipping.")
+            self.executor.submit(self._handle, event.src_path)
+
+    def on_moved(self, event):
+        # completed downloads arrive as a rename from .part to the final name
+        if not event.is_directory:
+            if event.dest_path.lower().endswith(PARTIAL_EXTENSIONS):
+                return
+            logging.info(f"File renamed into place: {event.dest_path}")
+            self.executor.submit(self._handle, event.dest_path)
 
 class ReportsHandler(FileSystemEventHandler):
     """Detects new ticker folders inside reports/"""
-    def __init__(self, observers, reports_dir):
+    def __init__(self, observers, reports_dir, executor):
         self.observers = observers
         self.reports_dir = reports_dir
+        self.executor = executor
 
     def on_created(self, event):
         if event.is_directory:
             ticker_name = os.path.basename(event.src_path)
             logging.info(f"New ticker folder detected: {ticker_name}")
-            watch_ticker(event.src_path, self.observers)
+            watch_ticker(event.src_path, self.observers, self.executor)
 
 # ----------------- Watcher Functions -----------------
-def watch_ticker(ticker_dir, observers):
+def watch_ticker(ticker_dir, observers, executor):
     """Start watching a single ticker folder's downloads"""
     downloads_dir = os.path.join(ticker_dir, "downloads")
     unzipped_dir = os.path.join(ticker_dir, "unzipped")
@@ -119,12 +164,12 @@ def watch_ticker(ticker_dir, observers):
     os.makedirs(unzipped_dir, exist_ok=True)
 
     # Process existing files first
-    for item in os.listdir(downloads_dir):
-        path = os.path.join(downloads_dir, item)
-        process_file(path, unzipped_dir)
+    with os.scandir(downloads_dir) as entries:
+        for entry in entries:
+            executor.submit(process_file, entry.path, unzipped_dir)
 
     # Start watcher
-    event_handler = DownloadsHandler(unzipped_dir)
+    event_handler = DownloadsHandler(unzipped_dir, executor)
     observer = Observer()
     observer.schedule(event_handler, downloads_dir, recursive=False)
     observer.start()
@@ -135,17 +180,20 @@ def watch_ticker(ticker_dir, observers):
 def watch_and_process():
     config = load_config()
     reports_dir = config.get("reports_dir", "./reports")
+    max_workers = config.get("max_workers", 4)
 
     observers = []
+    # All extraction/copy work runs here so observer event threads never block
+    executor = ThreadPoolExecutor(max_workers=max_workers)
 
     # Watch all existing ticker folders at startup
     for ticker in os.listdir(reports_dir):
         ticker_dir = os.path.join(reports_dir, ticker)
         if os.path.isdir(ticker_dir):
-            watch_ticker(ticker_dir, observers)
+            watch_ticker(ticker_dir, observers, executor)
 
     # Watch for new ticker folders dynamically
-    reports_handler = ReportsHandler(observers, reports_dir)
+    reports_handler = ReportsHandler(observers, reports_dir, executor)
     reports_observer = Observer()
     reports_observer.schedule(reports_handler, reports_dir, recursive=False)
     reports_observer.start()
@@ -161,6 +209,7 @@ def watch_and_process():
             obs.stop()
     for obs in observers:
         obs.join()
+    executor.shutdown(wait=True)
 
 # ----------------- Run -----------------
 if __name__ == "__main__":